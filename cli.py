@@ -2,79 +2,70 @@
 """Non-interactive CLI for Qwen3-TTS on Apple Silicon."""
 
 import argparse
+import json
 import os
 import re
-import shutil
 import sys
-import time
-import warnings
-from datetime import datetime
-
-os.environ["TOKENIZERS_PARALLELISM"] = "false"
-warnings.filterwarnings("ignore", category=UserWarning)
-warnings.filterwarnings("ignore", category=FutureWarning)
-
-MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
-
-MODEL_MAP = {
-    "speak": {
-        "pro": "Qwen3-TTS-12Hz-1.7B-CustomVoice-8bit",
-        "lite": "Qwen3-TTS-12Hz-0.6B-CustomVoice-8bit",
-    },
-    "design": {
-        "pro": "Qwen3-TTS-12Hz-1.7B-VoiceDesign-8bit",
-    },
-    "clone": {
-        "pro": "Qwen3-TTS-12Hz-1.7B-Base-8bit",
-        "lite": "Qwen3-TTS-12Hz-0.6B-Base-8bit",
-    },
-}
-
-
-def get_smart_path(folder_name):
-    full_path = os.path.join(MODELS_DIR, folder_name)
-    if not os.path.exists(full_path):
-        return f"mlx-community/{folder_name}"
-    snapshots_dir = os.path.join(full_path, "snapshots")
-    if os.path.exists(snapshots_dir):
-        subfolders = [f for f in os.listdir(snapshots_dir) if not f.startswith(".")]
-        if subfolders:
-            return os.path.join(snapshots_dir, subfolders[0])
-    return full_path
+import wave
+
+from qwen3tts import (
+    DEFAULT_QUANT,
+    MODEL_MAP,
+    QUANT_BITS,
+    load_model_cached,
+    load_model_shared,
+    read_text_file,
+    strip_unsafe_chars,
+)
+
+SOCKET_PATH = os.path.expanduser("~/.qwen3tts.sock")
+CONNECT_TIMEOUT = 5
+
+_SENT_RE = re.compile(r"(?<=[.!?])\s+")
 
 
 def resolve_text(text_arg):
     if os.path.isfile(text_arg) and text_arg.endswith(".txt"):
-        with open(text_arg, "r", encoding="utf-8") as f:
-            return f.read().strip()
+        return read_text_file(text_arg)
     return text_arg
 
 
 def split_into_chunks(text):
-    """Split text into sentence-separated chunks joined by newlines.
+    """Split text into sentence chunks.
 
-    generate_audio splits on '\\n' and processes each segment independently,
-    then join_audio=True stitches them into one file. This avoids hitting
-    the per-segment token limit (~96s of audio at 12.5 Hz) on long texts.
+    Each chunk is synthesized as its own segment and the audio is joined
+    afterwards. This avoids hitting the per-segment token limit (~96s of
+    audio at 12.5 Hz) on long texts.
     """
-    sentences = re.split(r"(?<=[.!?])\s+", text)
-    return "\n".join(s.strip() for s in sentences if s.strip())
+    return [s for s in map(str.strip, _SENT_RE.split(text)) if s]
+
+
+def write_wav(path, audio, sample_rate):
+    """Write a mono float waveform as 16-bit PCM."""
+    import numpy as np
+
+    samples = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((samples * 32767).astype("<i2").tobytes())
 
 
 def make_filename(text):
+    from datetime import datetime
+
     timestamp = datetime.now().strftime("%H-%M-%S")
-    snippet = re.sub(r"[^\w\s-]", "", text)[:20].strip().replace(" ", "_") or "audio"
+    snippet = strip_unsafe_chars(text)[:20].strip().replace(" ", "_") or "audio"
     return f"{timestamp}_{snippet}.wav"
 
 
-def generate(args, mode):
-    try:
-        from mlx_audio.tts.utils import load_model
-        from mlx_audio.tts.generate import generate_audio
-    except ImportError:
-        print("Error: mlx_audio not found. Activate the venv first.", file=sys.stderr)
-        sys.exit(1)
+def build_request(args, mode):
+    """Validate CLI arguments and turn them into a JSON-serialisable request.
 
+    All paths are made absolute so the request can be handed to a server
+    running from a different working directory.
+    """
     folder = MODEL_MAP[mode].get(args.model)
     if folder is None:
         print(f"Error: --model {args.model} is not available for '{mode}'.", file=sys.stderr)
@@ -88,65 +79,236 @@ def generate(args, mode):
     output_dir = os.path.abspath(args.output)
     os.makedirs(output_dir, exist_ok=True)
 
-    model_path = get_smart_path(folder)
-    print(f"Loading model: {folder}")
-    model = load_model(model_path)
-
-    text = split_into_chunks(text)
-
-    temp_dir = f"temp_cli_{int(time.time())}"
-    print("Generating audio...")
+    filename = args.filename if args.filename else make_filename(text)
+    if not filename.endswith(".wav"):
+        filename += ".wav"
 
-    common = dict(
-        model=model,
-        text=text,
-        output_path=temp_dir,
-        join_audio=True,
-        max_tokens=4096,
-    )
+    request = {
+        "mode": mode,
+        "folder": folder,
+        "quant": args.quant,
+        "text": text,
+        "dest": os.path.join(output_dir, filename),
+    }
 
     if mode == "speak":
-        generate_audio(
-            **common,
-            voice=args.voice,
-            instruct=args.emotion,
-            speed=args.speed,
-        )
+        request.update(voice=args.voice, emotion=args.emotion, speed=args.speed)
     elif mode == "design":
-        generate_audio(
-            **common,
-            instruct=args.description,
-        )
+        request.update(description=args.description)
     elif mode == "clone":
         ref_audio = os.path.abspath(args.ref_audio)
         if not os.path.isfile(ref_audio):
             print(f"Error: reference audio not found: {ref_audio}", file=sys.stderr)
             sys.exit(1)
-        generate_audio(
-            **common,
-            ref_audio=ref_audio,
-            ref_text=args.ref_text,
-        )
-
-    # join_audio=True produces "audio.wav"; without it, "audio_000.wav"
-    source = os.path.join(temp_dir, "audio.wav")
-    if not os.path.exists(source):
-        source = os.path.join(temp_dir, "audio_000.wav")
-    if not os.path.exists(source):
-        print("Error: generation produced no output.", file=sys.stderr)
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        request.update(ref_audio=ref_audio, ref_text=args.ref_text)
+
+    return request
+
+
+def synthesize(model, request):
+    """Run one request against an already loaded model; return the WAV path."""
+    import mlx.core as mx
+
+    mode = request["mode"]
+    if mode == "speak":
+        params = dict(voice=request["voice"], instruct=request["emotion"], speed=request["speed"])
+    elif mode == "design":
+        params = dict(instruct=request["description"])
+    elif mode == "clone":
+        from mlx_audio.utils import load_audio
+
+        ref_audio = load_audio(request["ref_audio"], sample_rate=model.sample_rate)
+        params = dict(ref_audio=ref_audio, ref_text=request["ref_text"])
+
+    # Same sampling defaults generate_audio passes; model.generate's own
+    # (temperature 0.9, language auto-detect) differ.
+    params.update(temperature=0.7, lang_code="en")
+
+    # Chunks run back to back: generate() evaluates each segment before it
+    # yields, so there is no GPU work left to overlap with the next chunk.
+    # Each call also re-encodes a clone reference with the speech tokenizer.
+    segments = []
+    for chunk in split_into_chunks(request["text"]):
+        for result in model.generate(text=chunk, max_tokens=4096, **params):
+            segments.append(result.audio)
+
+    if not segments:
+        raise RuntimeError("generation produced no output.")
+
+    audio = mx.concatenate(segments).astype(mx.float32)
+    mx.eval(audio)
+
+    dest = request["dest"]
+    write_wav(dest, audio, model.sample_rate)
+    return dest
+
+
+def send_to_server(request):
+    """Hand a request to a running `serve` process.
+
+    Returns the server's reply, or None when no server is listening so the
+    caller can fall back to generating in-process.
+    """
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        return None
+    # Generation itself can take minutes; only the connect is bounded
+    sock.settimeout(None)
+
+    with sock, sock.makefile("rb") as reader:
+        print("Sending to server...")
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        line = reader.readline()
+    return json.loads(line) if line else None
+
+
+def generate(args, mode):
+    request = build_request(args, mode)
+
+    reply = send_to_server(request)
+    if reply is not None and reply.get("not_loaded"):
+        print("Server does not have this model loaded; generating in-process.")
+    elif reply is not None:
+        if "error" in reply:
+            print(f"Error: {reply['error']}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Saved: {reply['path']}")
+        return
+
+    try:
+        import mlx_audio  # noqa: F401
+    except ImportError:
+        print("Error: mlx_audio not found. Activate the venv first.", file=sys.stderr)
         sys.exit(1)
 
-    filename = args.filename if args.filename else make_filename(text)
-    if not filename.endswith(".wav"):
-        filename += ".wav"
-    dest = os.path.join(output_dir, filename)
-    shutil.move(source, dest)
-    shutil.rmtree(temp_dir, ignore_errors=True)
+    print(f"Loading model: {request['folder']} ({request['quant']})")
+    model = load_model_cached(request["folder"], request["quant"])
+
+    print("Generating audio...")
+    try:
+        dest = synthesize(model, request)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
     print(f"Saved: {dest}")
 
 
+def handle_request(models, line):
+    try:
+        request = json.loads(line)
+        key = (request["folder"], request.get("quant", DEFAULT_QUANT))
+        model = models.get(key)
+        if model is None:
+            return {
+                "error": "model '{}' ({}) is not loaded by this server.".format(*key),
+                "not_loaded": True,
+            }
+        return {"path": synthesize(model, request)}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def serve(args):
+    """Keep models resident and answer JSON-line requests on SOCKET_PATH.
+
+    Requests are handled one at a time on a single thread: MLX does not
+    support overlapping generate calls on the same model.
+    """
+    import gc
+    import selectors
+    import socket
+
+    try:
+        import mlx_audio  # noqa: F401
+    except ImportError:
+        print("Error: mlx_audio not found. Activate the venv first.", file=sys.stderr)
+        sys.exit(1)
+
+    if os.path.exists(SOCKET_PATH):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(SOCKET_PATH)
+        except OSError:
+            os.unlink(SOCKET_PATH)
+        else:
+            print(f"Error: a server is already listening on {SOCKET_PATH}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            probe.close()
+
+    # Long-lived process with many short-lived strings; collect rarely
+    gc.set_threshold(100000, 10, 10)
+
+    models = {}
+    for mode in args.modes:
+        folder = MODEL_MAP[mode].get(args.model)
+        if folder is None:
+            print(f"Skipping '{mode}': --model {args.model} is not available.")
+            continue
+        if (folder, args.quant) not in models:
+            print(f"Loading model: {folder} ({args.quant})")
+            models[folder, args.quant] = load_model_shared(folder, args.quant)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Create the socket owner-only from the start; requests name output
+    # paths the server writes to, so no other user may connect
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(SOCKET_PATH)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+
+    sel = selectors.DefaultSelector()
+    sel.register(server, selectors.EVENT_READ)
+    buffers = {}
+
+    def close(conn):
+        sel.unregister(conn)
+        conn.close()
+        buffers.pop(conn, None)
+
+    print(f"Listening on {SOCKET_PATH} (Ctrl+C to stop)")
+    try:
+        while True:
+            for key, _ in sel.select():
+                conn = key.fileobj
+                if conn is server:
+                    conn, _ = server.accept()
+                    sel.register(conn, selectors.EVENT_READ)
+                    buffers[conn] = b""
+                    continue
+
+                data = conn.recv(65536)
+                if not data:
+                    close(conn)
+                    continue
+
+                buffers[conn] += data
+                while b"\n" in buffers.get(conn, b""):
+                    line, buffers[conn] = buffers[conn].split(b"\n", 1)
+                    reply = handle_request(models, line)
+                    try:
+                        conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+                    except OSError:
+                        close(conn)
+                    gc.collect(generation=1)
+    except KeyboardInterrupt:
+        print("\nStopping server...")
+    finally:
+        sel.close()
+        server.close()
+        if os.path.exists(SOCKET_PATH):
+            os.unlink(SOCKET_PATH)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Qwen3-TTS CLI — generate speech from text"
@@ -172,13 +334,24 @@ def main():
     cp.add_argument("--ref-text", default=".", help="Transcript of the reference audio")
 
     # common options
+    quant_help = f"Weight precision; the published models are int8 (default: {DEFAULT_QUANT})"
     for p in (sp, dp, cp):
         p.add_argument("-o", "--output", default="./outputs", help="Output directory (default: ./outputs)")
         p.add_argument("--model", choices=["pro", "lite"], default="pro", help="Model size (default: pro)")
         p.add_argument("--filename", default=None, help="Output filename (default: auto-generated)")
+        p.add_argument("--quant", choices=list(QUANT_BITS), default=DEFAULT_QUANT, help=quant_help)
+
+    # -- serve (persistent model server) --
+    sv = sub.add_parser("serve", help="Keep models loaded and serve requests from other CLI calls")
+    sv.add_argument("--modes", nargs="+", choices=list(MODEL_MAP), default=list(MODEL_MAP), help="Modes to load (default: all)")
+    sv.add_argument("--model", choices=["pro", "lite"], default="pro", help="Model size (default: pro)")
+    sv.add_argument("--quant", choices=list(QUANT_BITS), default=DEFAULT_QUANT, help=quant_help)
 
     args = parser.parse_args()
-    generate(args, args.command)
+    if args.command == "serve":
+        serve(args)
+    else:
+        generate(args, args.command)
 
 
 if __name__ == "__main__":
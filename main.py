@@ -4,43 +4,50 @@ import shutil
 import time
 import wave
 import gc
-import re
 import subprocess
-import warnings
-from datetime import datetime
-
-# Suppress harmless library warnings
-os.environ["TOKENIZERS_PARALLELISM"] = "false"
-warnings.filterwarnings("ignore", category=UserWarning)
-warnings.filterwarnings("ignore", category=FutureWarning)
-
-try:
-    from mlx_audio.tts.utils import load_model
-    from mlx_audio.tts.generate import generate_audio
-except ImportError:
-    print("Error: 'mlx_audio' library not found.")
-    print("Run: source .venv/bin/activate")
-    sys.exit(1)
-
-# Configuration
-BASE_OUTPUT_DIR = os.path.join(os.getcwd(), "outputs")
-MODELS_DIR = os.path.join(os.getcwd(), "models")
-VOICES_DIR = os.path.join(os.getcwd(), "voices")
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from qwen3tts import (
+    DEFAULT_QUANT,
+    MODEL_MAP,
+    OUTPUTS_DIR,
+    QUANT_BITS,
+    VOICES_DIR,
+    get_saved_voices,
+    load_model_cached,
+    prefetch_model,
+    read_text_file,
+    strip_unsafe_chars,
+)
 
 # Settings
 AUTO_PLAY = True
+QUANT = DEFAULT_QUANT
 SAMPLE_RATE = 24000
 FILENAME_MAX_LEN = 20
 
+# Playback runs in the background, one clip after another: _player starts
+# each afplay once the process in _playing has finished
+_player = ThreadPoolExecutor(max_workers=1)
+_playing = []
+_play_lock = threading.Lock()
+_play_stopped = threading.Event()
+
+# Most recently loaded (folder, precision) and its model, reused when the
+# user comes back to the same mode
+_LAST_MODEL = {"key": None, "model": None}
+
 # Model Definitions
 MODELS = {
     # Pro (1.7B)
-    "1": {"name": "Custom Voice", "folder": "Qwen3-TTS-12Hz-1.7B-CustomVoice-8bit", "mode": "custom", "output_subfolder": "CustomVoice"},
-    "2": {"name": "Voice Design", "folder": "Qwen3-TTS-12Hz-1.7B-VoiceDesign-8bit", "mode": "design", "output_subfolder": "VoiceDesign"},
-    "3": {"name": "Voice Cloning", "folder": "Qwen3-TTS-12Hz-1.7B-Base-8bit", "mode": "clone_manager", "output_subfolder": "Clones"},
+    "1": {"name": "Custom Voice", "folder": MODEL_MAP["speak"]["pro"], "mode": "custom", "output_subfolder": "CustomVoice"},
+    "2": {"name": "Voice Design", "folder": MODEL_MAP["design"]["pro"], "mode": "design", "output_subfolder": "VoiceDesign"},
+    "3": {"name": "Voice Cloning", "folder": MODEL_MAP["clone"]["pro"], "mode": "clone_manager", "output_subfolder": "Clones"},
     # Lite (0.6B)
-    "4": {"name": "Custom Voice", "folder": "Qwen3-TTS-12Hz-0.6B-CustomVoice-8bit", "mode": "custom", "output_subfolder": "CustomVoice"},
-    "5": {"name": "Voice Cloning", "folder": "Qwen3-TTS-12Hz-0.6B-Base-8bit", "mode": "clone_manager", "output_subfolder": "Clones"},
+    "4": {"name": "Custom Voice", "folder": MODEL_MAP["speak"]["lite"], "mode": "custom", "output_subfolder": "CustomVoice"},
+    "5": {"name": "Voice Cloning", "folder": MODEL_MAP["clone"]["lite"], "mode": "clone_manager", "output_subfolder": "Clones"},
 }
 
 SPEAKER_MAP = {
@@ -49,6 +56,8 @@ SPEAKER_MAP = {
     "Japanese": ["Ono_Anna"],
     "Korean": ["Sohee"]
 }
+_ALL_SPEAKERS = tuple(n for names in SPEAKER_MAP.values() for n in names)
+_SPEAKER_SET = frozenset(_ALL_SPEAKERS)
 
 EMOTION_EXAMPLES = [
     "Sad and crying, speaking slowly",
@@ -67,53 +76,102 @@ def flush_input():
 
 
 def clean_memory():
-    gc.collect()
+    # Young generations only: a full pass walks every wrapper of the loaded
+    # model for little gain, since MLX buffers aren't owned by Python cycles
+    gc.collect(generation=1)
+
+
+def prefetch_session_model(info):
+    # Nothing to fetch when load_session_model will reuse the loaded model
+    if _LAST_MODEL["key"] != (info["folder"], QUANT):
+        prefetch_model(info["folder"])
 
 
-def make_temp_dir():
-    return f"temp_{int(time.time())}"
+def load_session_model(info):
+    key = (info["folder"], QUANT)
+    if _LAST_MODEL["key"] == key:
+        return _LAST_MODEL["model"]
 
+    # Release the previous model with a full collection before loading, so
+    # two models never sit in unified memory at once
+    _LAST_MODEL["key"] = _LAST_MODEL["model"] = None
+    gc.collect()
+    model = load_model_cached(info["folder"], QUANT)
+    _LAST_MODEL.update(key=key, model=model)
+    return model
 
-def get_smart_path(folder_name):
-    full_path = os.path.join(MODELS_DIR, folder_name)
-    if not os.path.exists(full_path):
-        # Fall back to HuggingFace repo ID for auto-download
-        return f"mlx-community/{folder_name}"
 
-    snapshots_dir = os.path.join(full_path, "snapshots")
-    if os.path.exists(snapshots_dir):
-        subfolders = [f for f in os.listdir(snapshots_dir) if not f.startswith('.')]
-        if subfolders:
-            return os.path.join(snapshots_dir, subfolders[0])
+def import_generate_audio():
+    # Deferred so the menu comes up without paying for mlx/transformers
+    try:
+        from mlx_audio.tts.generate import generate_audio
+    except ImportError:
+        print("Error: 'mlx_audio' library not found.")
+        print("Run: source .venv/bin/activate")
+        sys.exit(1)
+    return generate_audio
+
+
+def play_clip(path):
+    """Play a clip once the previous one has finished, so clips queue up."""
+    for player in list(_playing):
+        player.wait()
+    with _play_lock:
+        if _play_stopped.is_set():
+            return
+        try:
+            _playing[:] = [subprocess.Popen(["afplay", path],
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+        except FileNotFoundError:
+            pass
 
-    return full_path
 
+def stop_playback():
+    """Stop the clip that is playing and drop the queued ones; used on exit."""
+    with _play_lock:
+        _play_stopped.set()
+        for player in _playing:
+            if player.poll() is None:
+                player.terminate()
+        _playing.clear()
+    _player.shutdown(wait=False, cancel_futures=True)
 
-def save_audio_file(temp_folder, subfolder, text_snippet):
-    save_path = os.path.join(BASE_OUTPUT_DIR, subfolder)
-    os.makedirs(save_path, exist_ok=True)
 
+def prepare_output(subfolder, text_snippet):
+    """Return the output folder and file stem for one generation.
+
+    generate_audio writes straight into the output folder, so the final
+    rename in save_audio_file never crosses a filesystem boundary.
+    """
+    from datetime import datetime
+
+    save_path = os.path.join(OUTPUTS_DIR, subfolder)
     timestamp = datetime.now().strftime("%H-%M-%S")
-    clean_text = re.sub(r'[^\w\s-]', '', text_snippet)[:FILENAME_MAX_LEN].strip().replace(' ', '_') or "audio"
-    filename = f"{timestamp}_{clean_text}.wav"
-    final_path = os.path.join(save_path, filename)
+    clean_text = strip_unsafe_chars(text_snippet)[:FILENAME_MAX_LEN].strip().replace(' ', '_') or "audio"
+    return save_path, f"{timestamp}_{clean_text}"
 
-    source_file = os.path.join(temp_folder, "audio_000.wav")
+
+def save_audio_file(save_path, stem):
+    filename = f"{stem}.wav"
+    final_path = os.path.join(save_path, filename)
+    source_file = os.path.join(save_path, f"{stem}_000.wav")
 
     if os.path.exists(source_file):
-        shutil.move(source_file, final_path)
-        print(f"Saved: outputs/{subfolder}/{filename}")
+        os.rename(source_file, final_path)
+        print(f"Saved: {os.path.relpath(final_path)}")
 
         if AUTO_PLAY:
             print("Playing...")
-            try:
-                subprocess.run(["afplay", final_path], check=False, 
-                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            except FileNotFoundError:
-                pass
+            _player.submit(play_clip, final_path)
 
-    if os.path.exists(temp_folder):
-        shutil.rmtree(temp_folder, ignore_errors=True)
+    # Only the first segment is kept; drop any extra ones generate_audio wrote
+    index = 1
+    while True:
+        extra = os.path.join(save_path, f"{stem}_{index:03d}.wav")
+        if not os.path.exists(extra):
+            break
+        os.unlink(extra)
+        index += 1
 
 
 def clean_path(user_input):
@@ -133,8 +191,7 @@ def get_safe_input(prompt="\nEnter text (or drag .txt file): "):
         if os.path.exists(clean_p) and clean_p.endswith(".txt"):
             print(f"Reading from: {os.path.basename(clean_p)}")
             try:
-                with open(clean_p, 'r', encoding='utf-8') as f:
-                    return f.read().strip()
+                return read_text_file(clean_p)
             except IOError as e:
                 print(f"Error reading file: {e}")
                 return None
@@ -145,17 +202,44 @@ def get_safe_input(prompt="\nEnter text (or drag .txt file): "):
         return None
 
 
+def convert_wav_in_process(input_path, output_path):
+    """Resample/downmix a WAV with soundfile + soxr, avoiding an ffmpeg spawn.
+
+    Returns False when the libraries are missing or can't read the file.
+    """
+    try:
+        import numpy as np
+        import soundfile as sf
+        import soxr
+    except ImportError:
+        return False
+
+    try:
+        data, rate = sf.read(input_path, dtype='float32', always_2d=True)
+    except RuntimeError:
+        return False
+
+    mono = data.mean(axis=1)
+    if rate != SAMPLE_RATE:
+        mono = soxr.resample(mono, rate, SAMPLE_RATE)
+    # Resampling can overshoot on loud samples; PCM_16 would wrap, not clip
+    sf.write(output_path, np.clip(mono, -1.0, 1.0), SAMPLE_RATE, subtype='PCM_16')
+    return True
+
+
 def convert_audio_if_needed(input_path):
     if not os.path.exists(input_path):
         return None
 
     filename = os.path.basename(input_path)
     name, ext = os.path.splitext(filename)
+    is_wav = ext.lower() == ".wav"
 
-    if ext.lower() == ".wav":
+    if is_wav:
         try:
             with wave.open(input_path, 'rb') as f:
-                if f.getnchannels() > 0:
+                if (f.getframerate() == SAMPLE_RATE and f.getnchannels() == 1
+                        and f.getsampwidth() == 2):
                     return input_path
         except wave.Error:
             pass
@@ -163,6 +247,9 @@ def convert_audio_if_needed(input_path):
     temp_wav = os.path.join(os.getcwd(), f"temp_convert_{int(time.time())}.wav")
     print(f"Converting '{ext}' to WAV...")
 
+    if is_wav and convert_wav_in_process(input_path, temp_wav):
+        return temp_wav
+
     cmd = ["ffmpeg", "-y", "-v", "error", "-i", input_path, 
            "-ar", str(SAMPLE_RATE), "-ac", "1", "-c:a", "pcm_s16le", temp_wav]
 
@@ -174,13 +261,6 @@ def convert_audio_if_needed(input_path):
         return None
 
 
-def get_saved_voices():
-    if not os.path.exists(VOICES_DIR):
-        return []
-    voices = [f.replace(".wav", "") for f in os.listdir(VOICES_DIR) if f.endswith(".wav")]
-    return sorted(voices)
-
-
 def enroll_new_voice():
     print("\n--- Enroll New Voice ---")
     flush_input()
@@ -189,7 +269,7 @@ def enroll_new_voice():
     if not name:
         return
 
-    safe_name = re.sub(r'[^\w\s-]', '', name).strip().replace(' ', '_')
+    safe_name = strip_unsafe_chars(name).strip().replace(' ', '_')
 
     ref_input = input("2. Drag & Drop Reference File: ").strip()
     raw_path = clean_path(ref_input)
@@ -212,9 +292,18 @@ def enroll_new_voice():
     target_wav = os.path.join(VOICES_DIR, f"{safe_name}.wav")
     target_txt = os.path.join(VOICES_DIR, f"{safe_name}.txt")
 
-    shutil.copy(clean_wav_path, target_wav)
-    with open(target_txt, "w", encoding='utf-8') as f:
-        f.write(ref_text)
+    # Re-enrolling from the saved sample itself: keep it, update the transcript
+    if not (os.path.exists(target_wav) and os.path.samefile(clean_wav_path, target_wav)):
+        # A hardlink costs nothing on the same filesystem; copy only if it
+        # fails. Either way the old sample is only replaced once the new
+        # file exists.
+        temp_target = os.path.join(VOICES_DIR, f".{safe_name}.{os.getpid()}.tmp")
+        try:
+            os.link(clean_wav_path, temp_target)
+        except OSError:
+            shutil.copyfile(clean_wav_path, temp_target)
+        os.replace(temp_target, target_wav)
+    Path(target_txt).write_text(ref_text, encoding='utf-8')
 
     if clean_wav_path != raw_path and os.path.exists(clean_wav_path):
         os.remove(clean_wav_path)
@@ -223,29 +312,17 @@ def enroll_new_voice():
 
 
 def run_custom_session(model_key):
+    generate_audio = import_generate_audio()
     info = MODELS[model_key]
-    model_path = get_smart_path(info["folder"])
-    if not model_path:
-        print("Error: Model not found.")
-        return
-
-    print(f"\nLoading {info['name']}...")
-    try:
-        model = load_model(model_path)
-    except Exception as e:
-        print(f"Load failed: {e}")
-        return
+    prefetch_session_model(info)
 
     print(f"\n--- {info['name']} ---")
     speaker = "Vivian"
-    all_speakers = [n for names in SPEAKER_MAP.values() for n in names]
-    print("Available Speakers: " + ", ".join(all_speakers))
+    print("Available Speakers: " + ", ".join(_ALL_SPEAKERS))
 
     user_choice = input("\nSelect Speaker (Name): ").strip()
-    for lang, names in SPEAKER_MAP.items():
-        if user_choice in names:
-            speaker = user_choice
-            break
+    if user_choice in _SPEAKER_SET:
+        speaker = user_choice
     print(f"Using: {speaker}")
 
     print("\nEmotion Examples:")
@@ -264,49 +341,55 @@ def run_custom_session(model_key):
     elif sp == "3":
         speed = 0.8
 
+    print(f"\nLoading {info['name']}...")
+    try:
+        model = load_session_model(info)
+    except Exception as e:
+        print(f"Load failed: {e}")
+        return
+
     while True:
         text = get_safe_input()
         if text is None:
             break
         print("Generating...")
-        temp_dir = make_temp_dir()
+        save_path, stem = prepare_output(info["output_subfolder"], text)
         try:
-            generate_audio(model=model, text=text, voice=speaker, 
-                         instruct=base_instruct, speed=speed, output_path=temp_dir)
-            save_audio_file(temp_dir, info["output_subfolder"], text)
+            generate_audio(model=model, text=text, voice=speaker, instruct=base_instruct,
+                         speed=speed, output_path=save_path, file_prefix=stem)
+            save_audio_file(save_path, stem)
         except Exception as e:
             print(f"Error: {e}")
     clean_memory()
 
 
 def run_design_session(model_key):
+    generate_audio = import_generate_audio()
     info = MODELS[model_key]
-    model_path = get_smart_path(info["folder"])
-    if not model_path:
-        print("Error: Model not found.")
+    prefetch_session_model(info)
+
+    print(f"\n--- {info['name']} ---")
+    instruct = input("Describe the voice: ").strip()
+    if not instruct:
         return
 
     print(f"\nLoading {info['name']}...")
     try:
-        model = load_model(model_path)
+        model = load_session_model(info)
     except Exception as e:
         print(f"Load failed: {e}")
         return
 
-    print(f"\n--- {info['name']} ---")
-    instruct = input("Describe the voice: ").strip()
-    if not instruct:
-        return
-
     while True:
         text = get_safe_input()
         if text is None:
             break
         print("Generating...")
-        temp_dir = make_temp_dir()
+        save_path, stem = prepare_output(info["output_subfolder"], text)
         try:
-            generate_audio(model=model, text=text, instruct=instruct, output_path=temp_dir)
-            save_audio_file(temp_dir, info["output_subfolder"], text)
+            generate_audio(model=model, text=text, instruct=instruct,
+                         output_path=save_path, file_prefix=stem)
+            save_audio_file(save_path, stem)
         except Exception as e:
             print(f"Error: {e}")
     clean_memory()
@@ -326,20 +409,11 @@ def run_clone_manager(model_key):
     if sub_choice == "4":
         return
 
+    generate_audio = import_generate_audio()
     info = MODELS[model_key]
-    model_path = get_smart_path(info["folder"])
-    if not model_path:
-        print("Error: Model not found.")
-        return
-
-    print("\nLoading Base Model...")
-    try:
-        model = load_model(model_path)
-    except Exception as e:
-        print(f"Load failed: {e}")
-        return
+    prefetch_session_model(info)
 
-    ref_audio, ref_text = None, None
+    ref_audio, ref_text, temp_audio = None, None, None
 
     if sub_choice == "1":
         saved = get_saved_voices()
@@ -371,26 +445,57 @@ def run_clone_manager(model_key):
         ref_audio = convert_audio_if_needed(raw_path)
         if not ref_audio:
             return
+        if ref_audio != raw_path:
+            temp_audio = ref_audio
         ref_text = input("   Transcript (Optional): ").strip() or "."
 
     else:
         return
 
+    try:
+        run_clone_session(info, generate_audio, ref_audio, ref_text)
+    finally:
+        # Quick Clone may have converted the sample into a temp file
+        if temp_audio and os.path.exists(temp_audio):
+            os.remove(temp_audio)
+
+
+def run_clone_session(info, generate_audio, ref_audio, ref_text):
+    print("\nLoading Base Model...")
+    try:
+        model = load_session_model(info)
+    except Exception as e:
+        print(f"Load failed: {e}")
+        return
+
     while True:
         text = get_safe_input(f"\nText for '{os.path.basename(str(ref_audio))}' (or 'exit'): ")
         if text is None:
             break
         print("Cloning...")
-        temp_dir = make_temp_dir()
+        save_path, stem = prepare_output(info["output_subfolder"], text)
         try:
-            generate_audio(model=model, text=text, ref_audio=ref_audio, 
-                         ref_text=ref_text, output_path=temp_dir)
-            save_audio_file(temp_dir, info["output_subfolder"], text)
+            generate_audio(model=model, text=text, ref_audio=ref_audio, ref_text=ref_text,
+                         output_path=save_path, file_prefix=stem)
+            save_audio_file(save_path, stem)
         except Exception as e:
             print(f"Error: {e}")
     clean_memory()
 
 
+def choose_precision():
+    global QUANT
+    print("\nPrecision:")
+    print("  none - full precision (most RAM)")
+    print("  int8 - published weights (default)")
+    print("  int4 - fastest, least RAM, slightly lower quality")
+    choice = input(f"Choice [{QUANT}]: ").strip().lower() or QUANT
+    if choice not in QUANT_BITS:
+        print("Invalid selection.")
+        return
+    QUANT = choice
+
+
 def main_menu():
     print("\n" + "=" * 40)
     print(" Qwen3-TTS Manager")
@@ -407,13 +512,19 @@ def main_menu():
     print("  4. Custom Voice")
     print("  5. Voice Cloning")
     
-    print("\n  q. Exit")
+    print(f"\n  p. Precision ({QUANT})")
+    print("  q. Exit")
 
     choice = input("\nSelect: ").strip().lower()
 
     if choice == "q":
+        stop_playback()
         sys.exit()
 
+    if choice == "p":
+        choose_precision()
+        return
+
     if choice not in MODELS:
         print("Invalid selection.")
         flush_input()
@@ -430,9 +541,17 @@ def main_menu():
 
 
 if __name__ == "__main__":
+    # Generation loops churn through many short-lived strings; collect rarely
+    gc.set_threshold(100000, 10, 10)
+    local_voices = os.path.abspath("voices")
+    if os.path.isdir(local_voices) and not os.path.samefile(local_voices, VOICES_DIR):
+        print(f"Note: using voices from {VOICES_DIR}, not ./voices")
     try:
-        os.makedirs(BASE_OUTPUT_DIR, exist_ok=True)
+        os.makedirs(OUTPUTS_DIR, exist_ok=True)
+        for subfolder in {m["output_subfolder"] for m in MODELS.values()}:
+            os.makedirs(os.path.join(OUTPUTS_DIR, subfolder), exist_ok=True)
         while True:
             main_menu()
     except KeyboardInterrupt:
+        stop_playback()
         print("\nExiting...")
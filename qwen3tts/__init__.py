@@ -0,0 +1,49 @@
+"""Helpers shared by the cli.py and main.py entry points."""
+
+import os
+import sys
+import warnings
+
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+# Suppress harmless library warnings, unless filters were already chosen
+# with -W or PYTHONWARNINGS (which the interpreter only reads at startup)
+if not sys.warnoptions:
+    warnings.filterwarnings("ignore", category=UserWarning)
+    warnings.filterwarnings("ignore", category=FutureWarning)
+
+from ._io import read_text_file  # noqa: E402
+from ._models import (  # noqa: E402
+    DEFAULT_QUANT,
+    QUANT_BITS,
+    load_model_cached,
+    load_model_shared,
+    prefetch_model,
+)
+from ._paths import (  # noqa: E402
+    CACHE_DIR,
+    MODEL_MAP,
+    MODELS_DIR,
+    OUTPUTS_DIR,
+    VOICES_DIR,
+    get_saved_voices,
+    get_smart_path,
+)
+from ._text import strip_unsafe_chars  # noqa: E402
+
+__all__ = [
+    "CACHE_DIR",
+    "DEFAULT_QUANT",
+    "MODEL_MAP",
+    "MODELS_DIR",
+    "OUTPUTS_DIR",
+    "QUANT_BITS",
+    "VOICES_DIR",
+    "get_saved_voices",
+    "get_smart_path",
+    "load_model_cached",
+    "load_model_shared",
+    "prefetch_model",
+    "read_text_file",
+    "strip_unsafe_chars",
+]
@@ -0,0 +1,21 @@
+"""Text file input."""
+
+import mmap
+import os
+
+# Below this size a plain read is cheaper than setting up a mapping
+MMAP_THRESHOLD = 1 << 20
+
+
+def read_text_file(path):
+    """Read a UTF-8 text file with surrounding whitespace stripped.
+
+    Large files are decoded straight from a read-only mapping, skipping the
+    intermediate read buffer.
+    """
+    if os.path.getsize(path) <= MMAP_THRESHOLD:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return str(mm, "utf-8").strip()
@@ -0,0 +1,202 @@
+"""Model loading with an on-disk weight cache and cross-model sharing."""
+
+import json
+import os
+import sys
+
+from ._paths import CACHE_DIR, MODELS_DIR, get_smart_path
+
+
+# Weight precision options; the published checkpoints are 8-bit
+QUANT_BITS = {"none": None, "int8": 8, "int4": 4}
+DEFAULT_QUANT = "int8"
+QUANT_GROUP_SIZE = 64
+
+
+def _requantize(model, bits):
+    """Convert the checkpoint's quantized layers to `bits` (None = dense).
+
+    Only layers the checkpoint already quantized are touched. Nothing is
+    evaluated here, so on a lazily loaded model this just rebuilds the
+    layer layout.
+    """
+    import mlx.core as mx
+    import mlx.nn as nn
+    from mlx.utils import tree_map_with_path
+
+    converted = set()
+
+    def dequantize(path, module):
+        if not isinstance(module, (nn.QuantizedLinear, nn.QuantizedEmbedding)):
+            return module
+        if module.bits == bits or getattr(module, "mode", "affine") != "affine":
+            return module
+        weight = mx.dequantize(
+            module.weight, module.scales, module.get("biases"),
+            group_size=module.group_size, bits=module.bits,
+        )
+        if isinstance(module, nn.QuantizedEmbedding):
+            dense = nn.Embedding(*weight.shape)
+        else:
+            dense = nn.Linear(weight.shape[1], weight.shape[0], bias="bias" in module)
+            if "bias" in module:
+                dense.bias = module.bias
+        dense.weight = weight
+        converted.add(path)
+        return dense
+
+    model.update_modules(
+        tree_map_with_path(dequantize, model.leaf_modules(), is_leaf=nn.Module.is_module)
+    )
+    if bits is not None and converted:
+        nn.quantize(
+            model, group_size=QUANT_GROUP_SIZE, bits=bits,
+            class_predicate=lambda path, _: path in converted,
+        )
+
+
+def load_model_cached(folder_name, quant=DEFAULT_QUANT):
+    """Load a model, reusing converted weights from CACHE_DIR.
+
+    The published checkpoints are already int8, so DEFAULT_QUANT loads them
+    as-is and is never cached. Other precisions are converted on the first
+    load and saved; later loads build the model lazily and take the
+    converted weights from that single file. The cache is invalidated when
+    the local snapshot changes. Set QWEN3_TTS_CACHE=0 to bypass it.
+    """
+    import mlx.core as mx
+    from mlx.utils import tree_flatten, tree_unflatten
+    from mlx_audio.tts.utils import load_model
+
+    def load(lazy=False):
+        model = load_model(model_path, lazy=lazy)
+        if quant != DEFAULT_QUANT:
+            _requantize(model, QUANT_BITS[quant])
+        return model
+
+    model_path = get_smart_path(folder_name)
+    if quant == DEFAULT_QUANT or os.environ.get("QWEN3_TTS_CACHE", "1") == "0":
+        model = load()
+        mx.eval(model.parameters())
+        return model
+
+    stem = f"{folder_name}.{quant}"
+    weights_file = os.path.join(CACHE_DIR, f"{stem}.safetensors")
+    meta_file = os.path.join(CACHE_DIR, f"{stem}.json")
+    mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else None
+    meta = {"source": model_path, "mtime": mtime}
+
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = None
+
+    if cached == meta and os.path.exists(weights_file):
+        model = load(lazy=True)
+        model.update(tree_unflatten(list(mx.load(weights_file).items())))
+        mx.eval(model.parameters())
+        return model
+
+    model = load()
+    mx.eval(model.parameters())
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        mx.save_safetensors(weights_file, dict(tree_flatten(model.parameters())))
+        with open(meta_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except (OSError, RuntimeError) as e:
+        print(f"Warning: could not write model cache: {e}", file=sys.stderr)
+    return model
+
+
+_BASE_CACHE = {}
+
+
+def load_model_shared(folder_name, quant=DEFAULT_QUANT):
+    """Load a model, reusing tensors identical to ones already loaded.
+
+    The Qwen3-TTS variants ship some identical weights (e.g. the speech
+    tokenizer), so when several modes are resident each shared tensor is
+    kept only once. Set QWEN3_TTS_SHARE_BASE=0 to disable.
+    """
+    model = load_model_cached(folder_name, quant)
+    if os.environ.get("QWEN3_TTS_SHARE_BASE", "1") != "1":
+        return model
+
+    import mlx.core as mx
+    from mlx.utils import tree_flatten, tree_unflatten
+
+    shared = []
+    for name, param in tree_flatten(model.parameters()):
+        key = (name, tuple(param.shape), param.dtype)
+        cached = _BASE_CACHE.setdefault(key, param)
+        if cached is not param and mx.array_equal(cached, param).item():
+            shared.append((name, cached))
+
+    if shared:
+        model.update(tree_unflatten(shared))
+        print(f"Sharing {len(shared)} tensors with previously loaded models")
+    return model
+
+
+# Files mlx_audio's loader downloads, for mlx-audio versions that don't
+# export DEFAULT_ALLOW_PATTERNS
+ALLOW_PATTERNS = [
+    "*.json", "*.safetensors", "*.py", "*.model", "*.tiktoken",
+    "*.txt", "*.jinja", "*.jsonl", "*.yaml", "*.npz", "*.pth",
+]
+
+
+def _download_errors():
+    """Exceptions a failed hub download can raise.
+
+    huggingface_hub's own errors subclass OSError, as do those of requests,
+    its HTTP client before 1.0; later versions let httpx/httpx2 transport
+    errors through as-is.
+    """
+    import importlib
+
+    errors = [OSError]
+    for client in ("httpx2", "httpx"):
+        try:
+            errors.append(importlib.import_module(client).HTTPError)
+        except ImportError:
+            pass
+    return tuple(errors)
+
+
+def prefetch_model(folder_name):
+    """Start downloading a model in the background if it isn't local.
+
+    Lets the download overlap with the prompts a session asks before it
+    loads. Files go to the default HuggingFace cache with the same allow
+    patterns load_model uses, so the later load finds exactly what it needs
+    on disk. Download errors are left for load_model to report.
+    """
+    if os.path.exists(os.path.join(MODELS_DIR, folder_name)):
+        return None
+
+    import threading
+
+    def download():
+        from huggingface_hub import snapshot_download
+
+        try:
+            from mlx_audio.utils import DEFAULT_ALLOW_PATTERNS as allow_patterns
+        except ImportError:
+            # Older mlx-audio releases don't export the list
+            allow_patterns = ALLOW_PATTERNS
+
+        try:
+            snapshot_download(
+                repo_id=f"mlx-community/{folder_name}",
+                allow_patterns=allow_patterns,
+            )
+        except _download_errors():
+            # Resurfaces when load_model retries the download
+            pass
+
+    thread = threading.Thread(target=download, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,60 @@
+"""Model, voice and output locations.
+
+Everything lives next to the package in the repository folder, so the
+entry points find the same files whatever the working directory.
+"""
+
+import os
+from functools import lru_cache
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(ROOT_DIR, "models")
+CACHE_DIR = os.path.join(MODELS_DIR, "_cache")
+VOICES_DIR = os.path.join(ROOT_DIR, "voices")
+OUTPUTS_DIR = os.path.join(ROOT_DIR, "outputs")
+
+MODEL_MAP = {
+    "speak": {
+        "pro": "Qwen3-TTS-12Hz-1.7B-CustomVoice-8bit",
+        "lite": "Qwen3-TTS-12Hz-0.6B-CustomVoice-8bit",
+    },
+    "design": {
+        "pro": "Qwen3-TTS-12Hz-1.7B-VoiceDesign-8bit",
+    },
+    "clone": {
+        "pro": "Qwen3-TTS-12Hz-1.7B-Base-8bit",
+        "lite": "Qwen3-TTS-12Hz-0.6B-Base-8bit",
+    },
+}
+
+
+@lru_cache(maxsize=16)
+def get_smart_path(folder_name):
+    full_path = os.path.join(MODELS_DIR, folder_name)
+    if not os.path.exists(full_path):
+        # Fall back to HuggingFace repo ID for auto-download
+        return f"mlx-community/{folder_name}"
+
+    snapshots_dir = os.path.join(full_path, "snapshots")
+    if os.path.exists(snapshots_dir):
+        with os.scandir(snapshots_dir) as entries:
+            snapshot = next((e.name for e in entries if not e.name.startswith(".")), None)
+        if snapshot:
+            return os.path.join(snapshots_dir, snapshot)
+
+    return full_path
+
+
+def get_saved_voices():
+    try:
+        mtime_ns = os.stat(VOICES_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return ()
+    return _scan_voices(mtime_ns)
+
+
+@lru_cache(maxsize=1)
+def _scan_voices(mtime_ns):
+    # Keyed on the directory mtime so enrolling a voice invalidates the cache
+    with os.scandir(VOICES_DIR) as entries:
+        return tuple(sorted(e.name[:-4] for e in entries if e.is_file() and e.name.endswith(".wav")))
@@ -0,0 +1,16 @@
+"""Filename-safe text."""
+
+import re
+
+_SAFE_RE = re.compile(r"[^\w\s-]")
+# Same filter as _SAFE_RE for ASCII text, applied without the regex engine
+_SAFE_TABLE = str.maketrans("", "", "".join(
+    c for c in map(chr, range(128)) if not (c.isalnum() or c.isspace() or c in "-_")
+))
+
+
+def strip_unsafe_chars(text):
+    """Keep only word characters, whitespace and hyphens."""
+    if text.isascii():
+        return text.translate(_SAFE_TABLE)
+    return _SAFE_RE.sub("", text)